@@ -3,7 +3,6 @@ from pathlib import Path
 import asyncio
 import logging
 from ineedproxy.get import fetch_json_proxy_list  # Import der Funktion
-from ineedproxy.get import get_request as _get_request
 
 proxy_data = Path("proxy_data")
 logging.getLogger("ineedproxy").setLevel(logging.DEBUG)  # default level for the logger is INFO
@@ -36,5 +35,7 @@ if __name__ == '__main__':
         print("Proxies:", len(manager))
         print("Proxy_response:\n", proxy_response)
 
+        await manager.aclose()
+
 
     asyncio.run(main())
@@ -3,7 +3,7 @@
 Library module initialization.
 """
 
-from typing import Tuple, List
+from typing import Tuple
 
 from .manager import Manager
 from .utils import NoProxyAvailable, ProxyPreferences, ProxyDict, URL
@@ -1,12 +1,33 @@
-from random import choice
+from random import randrange
 from pathlib import Path
-from typing import Optional, List, Union
-
-from .file_ops import read_msgpack, write_msgpack
-from .utils import ProxyDict, NoProxyAvailable, URL, ProxyIndex
+from array import array
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+import asyncio
+import atexit
+import weakref
+import warnings
+from typing import Optional, List, Union, Set, Dict, Tuple
+
+from .file_ops import read_msgpack, write_msgpack, pack_msgpack, counters_to_bytes, counters_from_bytes
+from .utils import ProxyDict, ProxyTable, NoProxyAvailable, URL, ProxyIndex, _ALLOWED_PROTOCOLS
 from .logger import logger
 
-from orjson import JSONDecodeError
+from msgspec import DecodeError
+
+
+def _log_write_error(future: Future) -> None:
+    if future.exception() is not None:
+        logger.error("Failed to write msgpack: %s", future.exception())
+
+
+# Managers to write at exit, held weakly so managers that aren't closed can still be garbage collected
+_OPEN_MANAGERS: "weakref.WeakSet[DataManager]" = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_open_managers() -> None:
+    for manager in list(_OPEN_MANAGERS):
+        manager.flush()
 
 
 def _validate_protocol(protocols: Union[str, List[str], None]) -> Optional[List[str]]:
@@ -14,14 +35,48 @@ def _validate_protocol(protocols: Union[str, List[str], None]) -> Optional[List[
         return None
     if isinstance(protocols, str):
         protocols = [protocols]
-    invalid_protocol = next((p for p in protocols if p not in ("http", "https", "socks4", "socks5")), None)
-    if invalid_protocol:
-        raise ValueError(f"Invalid protocol: {invalid_protocol}")
+    invalid_protocols = [p for p in protocols if p not in _ALLOWED_PROTOCOLS]
+    if invalid_protocols:
+        raise ValueError(f"Invalid protocols: {invalid_protocols}")
     return protocols
 
 
-def _rm_duplicate_proxies(proxies: List[ProxyDict]) -> List[ProxyDict]:
-    return [proxy for i, proxy in enumerate(proxies) if proxy not in proxies[:i]]
+def _split_url(url: Union[URL, str]) -> Tuple[str, Optional[str]]:
+    """Returns the url string and its protocol, only fully parsing urls without a known scheme."""
+    if isinstance(url, URL):
+        return url.url, url.protocol
+    url_repr = str(url)
+    protocol = url_repr[:url_repr.find("://")]
+    if protocol not in _ALLOWED_PROTOCOLS:
+        protocol = URL(url_repr).protocol
+    return url_repr, protocol
+
+
+def _filter_key(values: Union[List[str], str, None]) -> Optional[Tuple[str, ...]]:
+    """Normalizes a filter argument into a hashable form."""
+    if not values:
+        return None
+    if isinstance(values, str):
+        return (values,)
+    return tuple(sorted(values))
+
+
+def _union_mask(index: Dict[str, int], keys: Tuple[str, ...]) -> int:
+    """Returns the bitmap of proxies matching any of the keys."""
+    mask = 0
+    for key in keys:
+        mask |= index.get(key, 0)
+    return mask
+
+
+# Positions of the set bits for every byte value
+_BYTE_BITS = tuple(tuple(bit for bit in range(8) if byte >> bit & 1) for byte in range(256))
+
+
+def _set_bits(mask: int) -> Tuple[int, ...]:
+    """Returns the positions of all set bits, walking the mask a byte at a time."""
+    data = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+    return tuple(i * 8 + bit for i, byte in enumerate(data) if byte for bit in _BYTE_BITS[byte])
 
 
 class DataManager:
@@ -29,7 +84,8 @@ class DataManager:
                  allowed_fails_in_row: int,
                  fails_without_check: int,
                  percent_failed_to_remove: float,
-                 min_proxies: int):
+                 min_proxies: int,
+                 write_interval: float = 5.0):
         """
         Get add and remove proxies from a list with some extra features.
 
@@ -40,121 +96,271 @@ class DataManager:
         :param percent_failed_to_remove: Percentage of fails to remove a proxy.
         Example: 0.5 means 50% of tries are fails, if higher than that it gets removed.
         :param min_proxies: When len(proxies) < min_proxies -> fetch more proxies
+        :param write_interval: Seconds to collect changes before writing them to the msgpack file.
+        Only used while an event loop is running, otherwise changes are written right away.
+        Deferred writes happen on a background thread so they don't block the event loop.
         """
         self.msgpack = msgpack
         self.allowed_fails_in_row = allowed_fails_in_row
         self.fails_without_check = fails_without_check
         self.percent_failed_to_remove = percent_failed_to_remove
         self.min_proxies = min_proxies
-
-        self.proxies = self._load_proxies()
+        self.write_interval = write_interval
+
+        self._dirty = False
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._flush_loop: Optional[asyncio.AbstractEventLoop] = None
+        # A single worker keeps the writes in order, created on the first deferred write and dropped on close
+        self._io_executor: Optional[ThreadPoolExecutor] = None
+        self._last_write: Optional[Future] = None
+        _OPEN_MANAGERS.add(self)
+
+        # One column per proxy field, a proxy is the same index in every column
+        self.urls: List[str] = []
+        self.protocols: List[Optional[str]] = []
+        self.countries: List[Optional[str]] = []
+        self.anonymities: List[Optional[str]] = []
+        self.times_failed = array("i")
+        self.times_succeed = array("i")
+        self.times_failed_in_row = array("i")
+        self._load_proxies()
+        self._url_set: Set[str] = set()
+        self._rm_duplicate_proxies()
         logger.debug("Loaded %s proxies on init",
-                     len(self.proxies) if self.msgpack else "0 (Not storing data in a file!)")
+                     len(self.urls) if self.msgpack else "0 (Not storing data in a file!)")
 
         self.last_proxy_index = None
+        # Matching indices per get_proxy arguments, cleared whenever the index changes
+        self._candidates: Dict[tuple, Tuple[int, ...]] = {}
         self.index = ProxyIndex()
-        self.index.rebuild_index(self.proxies)
+        self.index.rebuild_index(self.protocols, self.countries, self.anonymities)
 
-    def _load_proxies(self) -> List[ProxyDict]:
+    def _load_proxies(self) -> None:
         if self.msgpack and self.msgpack.exists() and self.msgpack.stat().st_size > 0:
             try:
-                return read_msgpack(self.msgpack)
-            except JSONDecodeError:
+                table = read_msgpack(self.msgpack)
+            except DecodeError:
                 logger.warning("Failed to decode msgpack, returning empty list.")
-                return []
+                return
+
+            try:
+                times_failed = counters_from_bytes(table.times_failed)
+                times_succeed = counters_from_bytes(table.times_succeed)
+                times_failed_in_row = counters_from_bytes(table.times_failed_in_row)
+            except ValueError:
+                logger.warning("Msgpack counters are corrupted, returning empty list.")
+                return
+            columns = (table.url, table.protocol, table.country, table.anonymity,
+                       times_failed, times_succeed, times_failed_in_row)
+            if len({len(column) for column in columns}) != 1:
+                logger.warning("Msgpack columns have different lengths, returning empty list.")
+                return
+
+            (self.urls, self.protocols, self.countries, self.anonymities,
+             self.times_failed, self.times_succeed, self.times_failed_in_row) = columns
+            return
         if self.msgpack:
             self.msgpack.touch(exist_ok=True)
-        return []
 
     def _write_data(self):
-        if self.msgpack:
-            write_msgpack(self.msgpack, self.proxies)
+        """Marks the data as changed and schedules a single write for all changes in the next write_interval."""
+        if not self.msgpack:
+            return
+        self._dirty = True
+        # A closed manager may be used again, its changes still need to be written at exit
+        _OPEN_MANAGERS.add(self)
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._flush_handle is not None:
+            if self._flush_loop is loop:
+                return
+            # Scheduled in a loop that is gone by now, it would never fire
+            self._flush_handle.cancel()
+        self._flush_handle = loop.call_later(self.write_interval, self._submit_write)
+        self._flush_loop = loop
+
+    def _pack(self) -> bytes:
+        return pack_msgpack(ProxyTable(
+            url=self.urls,
+            protocol=self.protocols,
+            country=self.countries,
+            anonymity=self.anonymities,
+            times_failed=counters_to_bytes(self.times_failed),
+            times_succeed=counters_to_bytes(self.times_succeed),
+            times_failed_in_row=counters_to_bytes(self.times_failed_in_row)
+        ))
+
+    def _submit_write(self) -> None:
+        """Packs pending changes on the calling thread and hands the file write to the io thread."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if self._dirty and self.msgpack:
+            if self._io_executor is None:
+                self._io_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ineedproxy-io")
+            self._last_write = self._io_executor.submit(write_msgpack, self.msgpack, self._pack())
+            self._last_write.add_done_callback(_log_write_error)
+            self._dirty = False
+
+    def flush(self):
+        """Writes pending changes to the msgpack file right away."""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        # Let a background write finish first, so it can't overwrite newer data
+        if self._last_write is not None:
+            wait((self._last_write,))
+            self._last_write = None
+        if self._dirty and self.msgpack:
+            write_msgpack(self.msgpack, self._pack())
+            self._dirty = False
+
+    def close(self):
+        """Writes pending changes and stops writing them at exit. Call it once you are done with the data."""
+        self.flush()
+        _OPEN_MANAGERS.discard(self)
+        self._shutdown_executor()
+
+    async def aflush(self):
+        """Writes pending changes to the msgpack file without blocking the event loop."""
+        self._submit_write()
+        if self._last_write is not None:
+            await asyncio.wrap_future(self._last_write)
+
+    async def aclose(self):
+        """Like close, but waits for the last write without blocking the event loop."""
+        await self.aflush()
+        _OPEN_MANAGERS.discard(self)
+        self._shutdown_executor()
+
+    def _shutdown_executor(self):
+        """Stops the io thread after its last write, the next deferred write starts a new one."""
+        if self._io_executor is not None:
+            self._io_executor.shutdown(wait=True)
+            self._io_executor = None
+            self._last_write = None
+
+    def _rm_duplicate_proxies(self):
+        """Drops stored proxies with an already seen url and fills the url set. Only needed on load."""
+        first_seen = {}
+        for i, url in enumerate(self.urls):
+            first_seen.setdefault(url, i)
+        if len(first_seen) < len(self.urls):
+            logger.debug("Removed %d duplicate proxies from msgpack.", len(self.urls) - len(first_seen))
+            self._keep_slots(list(first_seen.values()))
+        self._url_set = set(first_seen)
+
+    def _keep_slots(self, keep: List[int]):
+        """Keeps only the given slots in every column, in the given order."""
+        self.urls = [self.urls[i] for i in keep]
+        self.protocols = [self.protocols[i] for i in keep]
+        self.countries = [self.countries[i] for i in keep]
+        self.anonymities = [self.anonymities[i] for i in keep]
+        self.times_failed = array("i", [self.times_failed[i] for i in keep])
+        self.times_succeed = array("i", [self.times_succeed[i] for i in keep])
+        self.times_failed_in_row = array("i", [self.times_failed_in_row[i] for i in keep])
+
+    def _columns(self) -> tuple:
+        return (self.urls, self.protocols, self.countries, self.anonymities,
+                self.times_failed, self.times_succeed, self.times_failed_in_row)
 
     def force_rm_last_proxy(self):
         if self.last_proxy_index is not None:
             self.rm_proxy(self.last_proxy_index)
 
     def feedback_proxy(self, success: bool):
-        if self.last_proxy_index is None or self.last_proxy_index >= len(self.proxies):
+        i = self.last_proxy_index
+        if i is None or i >= len(self.urls):
             return
 
-        proxy = self.proxies[self.last_proxy_index]
         if success:
-            proxy["times_succeed"] = proxy.get("times_succeed", 0) + 1
-            proxy["times_failed_in_row"] = 0
+            self.times_succeed[i] += 1
+            self.times_failed_in_row[i] = 0
         else:
-            proxy["times_failed"] = proxy.get("times_failed", 0) + 1
-            proxy["times_failed_in_row"] = proxy.get("times_failed_in_row", 0) + 1
+            self.times_failed[i] += 1
+            self.times_failed_in_row[i] += 1
 
-            total_attempts = proxy.get("times_failed", 0) + proxy.get("times_succeed", 0)
-            failed_ratio = proxy.get("times_failed", 0) / total_attempts if total_attempts > 0 else 0
+            times_failed = self.times_failed[i]
+            total_attempts = times_failed + self.times_succeed[i]
+            failed_ratio = times_failed / total_attempts if total_attempts > 0 else 0
 
-            should_remove = any([
-                proxy.get("times_failed_in_row", 0) > self.allowed_fails_in_row,
-                proxy.get("times_failed", 0) > self.fails_without_check and failed_ratio > self.percent_failed_to_remove
-            ])
+            too_many_in_row = self.times_failed_in_row[i] > self.allowed_fails_in_row
+            should_remove = too_many_in_row or (
+                    times_failed > self.fails_without_check and failed_ratio > self.percent_failed_to_remove
+            )
 
             if should_remove:
                 logger.debug(
                     "Removing proxy %s due to %s",
-                    proxy['url'],
-                    'too many failures in a row' if proxy.get('times_failed_in_row',
-                                                              0) > self.allowed_fails_in_row else 'bad success-failure ratio'
+                    self.urls[i],
+                    'too many failures in a row' if too_many_in_row else 'bad success-failure ratio'
                 )
 
-                self.rm_proxy(self.last_proxy_index)
+                self.rm_proxy(i)
         self._write_data()
 
-    def add_proxy(self, proxies: List[ProxyDict], remove_duplicates: bool = False) -> None:
-        """Adds proxies, removes duplicates if requested, and writes them to a file."""
-        start_index = len(self.proxies)
+    def add_proxy(self, proxies: List[ProxyDict], remove_duplicates: Optional[bool] = None) -> None:
+        """Adds proxies that are not stored yet and writes them to a file.
+        remove_duplicates is deprecated and ignored, duplicates are always skipped now."""
+        if remove_duplicates is not None:
+            warnings.warn("remove_duplicates is deprecated and ignored, duplicates are always removed.",
+                          DeprecationWarning, stacklevel=2)
         new_proxies = []
 
         for proxy in proxies:
-            url = URL(proxy["url"])
-            new_proxy = {
-                "url": str(url),  # Store the string representation of the URL
-                "protocol": url.protocol,
-                "country": proxy.get("country", "unknown"),
-                "anonymity": proxy.get("anonymity", "unknown"),
-                "times_failed": 0,
-                "times_succeed": 0,
-                "times_failed_in_row": 0
-            }
-            new_proxies.append(new_proxy)
-
-        if remove_duplicates:
-            new_proxies = _rm_duplicate_proxies(new_proxies)
+            url_repr, protocol = _split_url(proxy["url"])  # Store the string representation of the URL
+            if url_repr in self._url_set:
+                continue
+            self._url_set.add(url_repr)
+            new_proxies.append((url_repr, protocol,
+                                proxy.get("country", "unknown"), proxy.get("anonymity", "unknown")))
 
         logger.debug("Adding %d proxies. Removed %d duplicates.", len(new_proxies), len(proxies) - len(new_proxies))
-        self.proxies.extend(new_proxies)
 
-        # Update index for new proxies
-        for i, proxy in enumerate(new_proxies, start=start_index):
-            self.index.add_proxy(i, proxy)
+        for i, (url, protocol, country, anonymity) in enumerate(new_proxies, start=len(self.urls)):
+            for column, value in zip(self._columns(), (url, protocol, country, anonymity, 0, 0, 0)):
+                column.append(value)
+            self.index.add_proxy(i, protocol, country, anonymity)
+        self._candidates.clear()
 
         self._write_data()
 
     def rm_proxy(self, index: int):
-        if 0 <= index < len(self.proxies):
+        if 0 <= index < len(self.urls):
 
             # Remove from index first
-            proxy = self.proxies[index]
-            self.index.remove_proxy(index, proxy)
-
-            # Remove from a proxy list
-            self.proxies.pop(index)
-
-            if self.last_proxy_index is not None and index < self.last_proxy_index:
-                self.last_proxy_index -= 1
+            self.index.remove_proxy(index, self.protocols[index], self.countries[index], self.anonymities[index])
+            self._url_set.discard(self.urls[index])
+
+            # Move the last proxy into the freed slot instead of shifting every following proxy
+            last = len(self.urls) - 1
+            if index != last:
+                self.index.move_proxy(last, index, self.protocols[last], self.countries[last], self.anonymities[last])
+                for column in self._columns():
+                    column[index] = column[last]
+            for column in self._columns():
+                column.pop()
+            self._candidates.clear()
+
+            if self.last_proxy_index == index:
+                self.last_proxy_index = None
+            elif self.last_proxy_index == last:
+                self.last_proxy_index = index
             self._write_data()
         else:
             logger.error("Attempt to remove proxy at invalid index: %d", index)
             raise IndexError("Proxy does not exist")
 
     def rm_all_proxies(self):
-        self.proxies.clear()
+        for column in self._columns():
+            del column[:]
+        self._url_set.clear()
         self.index.clear()
+        self._candidates.clear()
+        self.last_proxy_index = None
         self._write_data()
 
     def get_proxy(self,
@@ -165,59 +371,59 @@ class DataManager:
                   exclude_country: Union[list[str], str, None] = None,
                   exclude_anonymity: Union[list[str], str, None] = None) -> URL:
 
-        if self.min_proxies and len(self.proxies) < self.min_proxies:
+        if self.min_proxies and len(self) < self.min_proxies:
             raise NoProxyAvailable("Not enough proxies available.")
 
-        valid_indices = set(range(len(self.proxies)))
-
-        # Include filters
-        if protocol:
-            protocol = [protocol] if isinstance(protocol, str) else protocol
-            protocol_indices = set().union(*(self.index.protocol_index[p] for p in protocol))
-            valid_indices &= protocol_indices
-
-        if country:
-            country = [country] if isinstance(country, str) else country
-            country_indices = set().union(*(self.index.country_index[c] for c in country))
-            valid_indices &= country_indices
-
-        if anonymity:
-            anonymity = [anonymity] if isinstance(anonymity, str) else anonymity
-            anonymity_indices = set().union(*(self.index.anonymity_index[a] for a in anonymity))
-            valid_indices &= anonymity_indices
-
-        # Exclude filters
-        if exclude_protocol:
-            exclude_protocol = [exclude_protocol] if isinstance(exclude_protocol, str) else exclude_protocol
-            exclude_indices = set().union(*(self.index.protocol_index[p] for p in exclude_protocol))
-            valid_indices -= exclude_indices
-
-        if exclude_country:
-            exclude_country = [exclude_country] if isinstance(exclude_country, str) else exclude_country
-            exclude_indices = set().union(*(self.index.country_index[c] for c in exclude_country))
-            valid_indices -= exclude_indices
-
-        if exclude_anonymity:
-            exclude_anonymity = [exclude_anonymity] if isinstance(exclude_anonymity, str) else exclude_anonymity
-            exclude_indices = set().union(*(self.index.anonymity_index[a] for a in exclude_anonymity))
-            valid_indices -= exclude_indices
-
-        if not valid_indices:
+        # The plain arguments are the cache key, so the common call with strings skips normalizing
+        key = (protocol, country, anonymity, exclude_protocol, exclude_country, exclude_anonymity)
+        try:
+            candidates = self._candidates.get(key)
+        except TypeError:  # Lists aren't hashable
+            key = tuple(map(_filter_key, key))
+            candidates = self._candidates.get(key)
+        if candidates is None:
+            # Only checked on a cache miss, a cached key has already passed
+            _validate_protocol(protocol)
+            _validate_protocol(exclude_protocol)
+            candidates = self._candidates[key] = _set_bits(self._filter_mask(*map(_filter_key, key)))
+
+        if not candidates:
             raise NoProxyAvailable("No proxy found with the given parameters.")
 
+        position = randrange(len(candidates))
         # Avoid consecutive same proxy unless it's the only option
-        if (
-                self.last_proxy_index is not None
-                and self.last_proxy_index in valid_indices
-                and len(valid_indices) > 1
-        ):
-            valid_indices.remove(self.last_proxy_index)
+        if candidates[position] == self.last_proxy_index and len(candidates) > 1:
+            position = (position + 1 + randrange(len(candidates) - 1)) % len(candidates)
 
-        selected_index = choice(list(valid_indices))
+        selected_index = candidates[position]
         self.last_proxy_index = selected_index
-        chosen_proxy = self.proxies[selected_index]["url"]
+        chosen_proxy = self.urls[selected_index]
         logger.debug("Chosen proxy: %s", chosen_proxy)
         return chosen_proxy
 
+    def _filter_mask(self, protocol, country, anonymity,
+                     exclude_protocol, exclude_country, exclude_anonymity) -> int:
+        """Returns the bitmap of all proxies matching the normalized filters from _filter_key."""
+        mask = (1 << len(self.urls)) - 1
+
+        # Include filters
+        for index, keys in (
+                (self.index.protocol_index, protocol),
+                (self.index.country_index, country),
+                (self.index.anonymity_index, anonymity),
+        ):
+            if keys:
+                mask &= _union_mask(index, keys)
+
+        # Exclude filters
+        for index, keys in (
+                (self.index.protocol_index, exclude_protocol),
+                (self.index.country_index, exclude_country),
+                (self.index.anonymity_index, exclude_anonymity),
+        ):
+            if keys:
+                mask &= ~_union_mask(index, keys)
+        return mask
+
     def __len__(self):
-        return len(self.proxies)
+        return len(self.urls)
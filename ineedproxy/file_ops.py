@@ -1,43 +1,114 @@
 from pathlib import Path
-from typing import List, Dict, Any
-import msgpack
+from array import array
+from typing import List, Optional
+import sys
+import msgspec
 
+from .utils import ProxyTable
 
-def read_msgpack(file: Path) -> List[Dict[str, Any]]:
+
+class _LegacyProxy(msgspec.Struct):
+    """A proxy as stored by older versions, which wrote a list of dictionaries."""
+    url: str
+    protocol: Optional[str] = None
+    country: Optional[str] = None
+    anonymity: Optional[str] = None
+    times_failed: int = 0
+    times_succeed: int = 0
+    times_failed_in_row: int = 0
+
+
+_ENCODER = msgspec.msgpack.Encoder()
+_DECODER = msgspec.msgpack.Decoder(ProxyTable)
+_LEGACY_DECODER = msgspec.msgpack.Decoder(List[_LegacyProxy])
+_BIG_ENDIAN = sys.byteorder == "big"
+
+
+def counters_to_bytes(counters: array) -> bytes:
+    """Packs an int32 counter column, always little-endian so files can be shared between hosts."""
+    if _BIG_ENDIAN:
+        counters = array(counters.typecode, counters)
+        counters.byteswap()
+    return counters.tobytes()
+
+
+def counters_from_bytes(data: bytes) -> array:
+    """Unpacks an int32 counter column written by counters_to_bytes.
+
+    Raises:
+        ValueError: If the data is not a whole number of counters.
+    """
+    counters = array("i")
+    counters.frombytes(data)
+    if _BIG_ENDIAN:
+        counters.byteswap()
+    return counters
+
+
+def _from_legacy(proxies: List[_LegacyProxy]) -> ProxyTable:
+    return ProxyTable(
+        url=[proxy.url for proxy in proxies],
+        protocol=[proxy.protocol for proxy in proxies],
+        country=[proxy.country for proxy in proxies],
+        anonymity=[proxy.anonymity for proxy in proxies],
+        times_failed=counters_to_bytes(array("i", [proxy.times_failed for proxy in proxies])),
+        times_succeed=counters_to_bytes(array("i", [proxy.times_succeed for proxy in proxies])),
+        times_failed_in_row=counters_to_bytes(array("i", [proxy.times_failed_in_row for proxy in proxies]))
+    )
+
+
+def read_msgpack(file: Path) -> ProxyTable:
     """Reads and unpacks data from a msgpack file.
 
     Args:
         file: Path to the msgpack file.
 
+    Files in the older list-of-dictionaries layout are converted to columns.
+
     Returns:
-        Unpacked data as a list of dictionaries.
+        Unpacked proxy columns.
 
     Raises:
         FileNotFoundError: If the file does not exist.
-        msgpack.UnpackException: If the file is corrupted.
+        msgspec.DecodeError: If the file is corrupted.
     """
     try:
-        with open(file, "rb") as f:
-            return msgpack.unpackb(f.read(), raw=False)
+        data = file.read_bytes()
     except FileNotFoundError:
         raise FileNotFoundError(f"Msgpack file not found: {file}")
-    except msgpack.UnpackException as e:
-        raise msgpack.UnpackException(f"Failed to unpack msgpack file {file}: {e}")
+    try:
+        return _DECODER.decode(data)
+    except msgspec.DecodeError as e:
+        try:
+            return _from_legacy(_LEGACY_DECODER.decode(data))
+        except (msgspec.DecodeError, OverflowError):
+            raise msgspec.DecodeError(f"Failed to unpack msgpack file {file}: {e}")
+
+
+def pack_msgpack(data: ProxyTable) -> bytes:
+    """Packs proxy columns into msgpack bytes.
+
+    Args:
+        data: Proxy columns to be packed.
+
+    Returns:
+        The packed data, ready for write_msgpack.
+    """
+    return _ENCODER.encode(data)
 
 
-def write_msgpack(file: Path, data: List[Dict[str, Any]]) -> None:
-    """Writes data to a msgpack file.
+def write_msgpack(file: Path, data: bytes) -> None:
+    """Writes packed data to a msgpack file.
 
     Args:
         file: Path where the msgpack file will be saved.
-        data: Data to be packed and written (list of dictionaries).
+        data: Packed proxy columns from pack_msgpack.
 
     Raises:
         PermissionError: If the file cannot be written.
     """
     try:
         file.parent.mkdir(parents=True, exist_ok=True)  # Ensure directory exists
-        with open(file, "wb") as f:
-            f.write(msgpack.packb(data, use_bin_type=True))
+        file.write_bytes(data)
     except PermissionError:
         raise PermissionError(f"No permission to write to {file}")
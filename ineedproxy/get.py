@@ -1,11 +1,52 @@
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Union
+from random import random
 import asyncio
 
 from .utils import ProxyDict, convert_to_proxy_dict_format
 from .logger import logger
 
-import orjson
 import aiohttp
+import msgspec
+
+_SESSION: Optional[aiohttp.ClientSession] = None
+_SESSION_LOOP: Optional[asyncio.AbstractEventLoop] = None
+# Limits how many proxy lists are fetched at the same time
+_FETCH_SEM: Optional[asyncio.Semaphore] = None
+_FETCH_SEM_LOOP: Optional[asyncio.AbstractEventLoop] = None
+
+
+async def _get_session() -> aiohttp.ClientSession:
+    """Returns the shared session, creating it on first use so connections are pooled across calls.
+    A session is bound to the loop it was created in, so a new one is created when the running loop changes."""
+    global _SESSION, _SESSION_LOOP
+    loop = asyncio.get_running_loop()
+    if _SESSION is None or _SESSION.closed or _SESSION_LOOP is not loop:
+        _SESSION = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300, keepalive_timeout=75),
+            timeout=aiohttp.ClientTimeout(total=10, connect=3)
+        )
+        _SESSION_LOOP = loop
+    return _SESSION
+
+
+def _get_fetch_semaphore() -> asyncio.Semaphore:
+    """Returns the fetch semaphore of the running loop, a semaphore can't be shared between loops."""
+    global _FETCH_SEM, _FETCH_SEM_LOOP
+    loop = asyncio.get_running_loop()
+    if _FETCH_SEM is None or _FETCH_SEM_LOOP is not loop:
+        _FETCH_SEM = asyncio.Semaphore(8)
+        _FETCH_SEM_LOOP = loop
+    return _FETCH_SEM
+
+
+async def close_session() -> None:
+    """Closes the shared session. Safe to call multiple times."""
+    global _SESSION, _SESSION_LOOP
+    # A session from another loop can't be closed from here, it is only dropped
+    if _SESSION is not None and not _SESSION.closed and _SESSION_LOOP is asyncio.get_running_loop():
+        await _SESSION.close()
+    _SESSION = None
+    _SESSION_LOOP = None
 
 
 async def get_request(
@@ -15,7 +56,8 @@ async def get_request(
         proxy: Optional[str] = None,
         session: Optional[aiohttp.ClientSession] = None,
         headers: Optional[Dict[str, str]] = None,
-) -> str:
+        raw: bool = False,
+) -> Union[str, bytes]:
     """
     Performs a GET request with retry logic and proper error handling.
 
@@ -24,11 +66,12 @@ async def get_request(
         retries: Number of retry attempts
         timeout: Request timeout in seconds
         proxy: Optional proxy URL
-        session: Optional aiohttp session to reuse
+        session: Optional aiohttp session to use instead of the shared one
         headers: Optional custom headers
+        raw: Return the undecoded response body as bytes
 
     Returns:
-        Response text content
+        Response text content, or bytes if raw is set
 
     Raises:
         Exception: If all retry attempts fail
@@ -47,52 +90,46 @@ async def get_request(
     if headers:
         default_headers.update(headers)
 
-    created_session = False
+    if session is None:
+        session = await _get_session()
+
     last_exception = None
 
-    try:
-        if session is None:
-            session = aiohttp.ClientSession()
-            created_session = True
-
-        for attempt in range(retries):
-            try:
-                async with session.get(
-                        url,
-                        headers=default_headers,
-                        proxy=proxy,
-                        timeout=aiohttp.ClientTimeout(total=timeout)
-                ) as response:
-                    if response.status >= 400:
-                        error_msg = f"HTTP error: {response.status}"
-                        logger.warning(f"{error_msg} (Attempt {attempt + 1}/{retries})")
-                        response.raise_for_status()  # This will raise an exception for 4xx/5xx status codes
-
-                    return await response.text()
-
-            except (
-                    aiohttp.ClientError,
-                    asyncio.TimeoutError
-            ) as e:
-                last_exception = e
-                logger.warning(f"Request failed (Attempt {attempt + 1}/{retries}): {str(e)}")
-
-                if attempt < retries - 1:
-                    # Exponential backoff for retries
-                    await asyncio.sleep(2 ** attempt)
-                    continue
-                break
-
-        # If we got here, all retries failed
-        logger.debug(f"All {retries} attempts failed for URL: {url}")
-        if last_exception:
-            raise last_exception
-        raise Exception(f"Failed to fetch {url} after {retries} attempts")
-
-    finally:
-        # Ensure the session is closed if we created it
-        if created_session and session is not None:
-            await session.close()
+    for attempt in range(retries):
+        try:
+            async with session.get(
+                    url,
+                    headers=default_headers,
+                    proxy=proxy,
+                    timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                if response.status >= 400:
+                    logger.warning("HTTP error: %d (Attempt %d/%d)", response.status, attempt + 1, retries)
+                    response.raise_for_status()  # This will raise an exception for 4xx/5xx status codes
+
+                return await response.read() if raw else await response.text()
+
+        except (
+                aiohttp.ClientError,
+                asyncio.TimeoutError
+        ) as e:
+            # Client errors won't go away by retrying, except for rate limiting
+            if isinstance(e, aiohttp.ClientResponseError) and 400 <= e.status < 500 and e.status != 429:
+                raise
+            last_exception = e
+            logger.warning("Request failed (Attempt %d/%d): %s", attempt + 1, retries, e)
+
+            if attempt < retries - 1:
+                # Exponential backoff with jitter, so parallel requests don't retry in lockstep
+                await asyncio.sleep(min(8.0, 0.1 * 2 ** attempt) * (0.5 + random()))
+                continue
+            break
+
+    # If we got here, all retries failed
+    logger.debug("All %d attempts failed for URL: %s", retries, url)
+    if last_exception:
+        raise last_exception
+    raise Exception(f"Failed to fetch {url} after {retries} attempts")
 
 
 async def fetch_json_proxy_list(url: str) -> List[ProxyDict]:
@@ -109,17 +146,19 @@ async def fetch_json_proxy_list(url: str) -> List[ProxyDict]:
         Exception: If the request fails or JSON parsing fails
     """
     try:
-        response = await get_request(url, retries=3, timeout=15)
+        async with _get_fetch_semaphore():
+            response = await get_request(url, retries=3, timeout=15, raw=True)
 
         try:
-            proxies = orjson.loads(response)
+            # Parse straight from the bytes, skipping the decode to str
+            proxies = msgspec.json.decode(response)
             proxy_list = convert_to_proxy_dict_format(proxies)
             return proxy_list
 
-        except orjson.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON response: {str(e)}")
+        except msgspec.DecodeError as e:
+            logger.error("Failed to parse JSON response: %s", e)
             raise Exception(f"Invalid JSON response from {url}: {str(e)}")
 
     except Exception as e:
-        logger.error(f"Failed to fetch proxy list from {url}: {str(e)}")
+        logger.error("Failed to fetch proxy list from %s: %s", url, e)
         raise
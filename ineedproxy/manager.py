@@ -1,12 +1,14 @@
 from typing import List, Union, Callable
 from pathlib import Path
+import asyncio
+import logging
 import aiohttp
 
 from .data_manager import DataManager
 from .utils import ProxyDict, ProxyPreferences, NoProxyAvailable
 from .test_proxies import get_valid_proxies
 from .logger import logger
-from .get import get_request as _get_request
+from .get import get_request as _get_request, close_session
 
 
 class Manager:
@@ -20,7 +22,8 @@ class Manager:
                  percent_failed_to_remove: float = 0.5,
                  max_proxies: Union[int, False] = 10,
                  min_proxies: Union[int, False] = 2,
-                 simultaneous_proxy_requests: int = 300) -> None:
+                 simultaneous_proxy_requests: int = 300,
+                 write_interval: float = 5.0) -> None:
         """
         The main class to control pretty much everything.
 
@@ -40,6 +43,7 @@ class Manager:
         Saves time when testing proxies.
         :param min_proxies: When len(proxies) < min_proxies, fetch more proxies.
         :param simultaneous_proxy_requests: Number of simultaneous requests to test proxies.
+        :param write_interval: Seconds to collect proxy changes before writing them to the data file.
         """
         self.simultaneous_proxy_requests = simultaneous_proxy_requests
         self.auto_fetch_proxies = auto_fetch_proxies
@@ -60,7 +64,8 @@ class Manager:
                                         allowed_fails_in_row=allowed_fails_in_row,
                                         fails_without_check=fails_without_check,
                                         percent_failed_to_remove=percent_failed_to_remove,
-                                        min_proxies=min_proxies)
+                                        min_proxies=min_proxies,
+                                        write_interval=write_interval)
 
     async def _async_init(self):
         if len(self.data_manager) < self.min_proxies and self.auto_fetch_proxies:
@@ -82,10 +87,20 @@ class Manager:
         if fetching_method is None:
             fetching_method = self.fetching_method
 
+        # Sources are independent, so fetch them concurrently and keep whatever succeeded
+        results = await asyncio.gather(*(method() for method in fetching_method), return_exceptions=True)
+
         all_proxies = []
-        for method in fetching_method:
-            proxies = await method()
-            all_proxies.extend(proxies)
+        errors = []
+        for method, result in zip(fetching_method, results):
+            if isinstance(result, BaseException):
+                logger.error("Fetching proxies with %s failed: %s", getattr(method, "__name__", method), result)
+                errors.append(result)
+            else:
+                all_proxies.extend(result)
+
+        if errors and len(errors) == len(results):
+            raise errors[0]
 
         if test_proxies:
             all_proxies = await get_valid_proxies(all_proxies, max_working_proxies=self.max_proxies,
@@ -93,7 +108,7 @@ class Manager:
 
         logger.debug("Fetched %d proxies", len(all_proxies))
 
-        self.data_manager.add_proxy(all_proxies, remove_duplicates=True if len(fetching_method) > 1 else False)
+        self.data_manager.add_proxy(all_proxies)
 
     async def get_proxy(self, ignore_preferences=False, **preferences_kwargs) -> str:
         """Returns a proxy from the data manager."""
@@ -133,8 +148,11 @@ class Manager:
 
     def feedback_proxy(self, success: bool) -> None:
         """Just feedback to the DataManager if the last proxy was successful or not."""
-        logger.debug("Feedback: Proxy %s was %s.", self.data_manager.proxies[self.data_manager.last_proxy_index]["url"],
-                     "successful" if success else "unsuccessful")
+        index = self.data_manager.last_proxy_index
+        # Only look up the url if it gets logged, the proxy may also be gone already
+        if index is not None and logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Feedback: Proxy %s was %s.", self.data_manager.urls[index],
+                         "successful" if success else "unsuccessful")
         self.data_manager.feedback_proxy(success)
 
     async def get_request(self, url: str, timeout: int = 10,
@@ -145,16 +163,13 @@ class Manager:
 
         :param url: The URL to request.
         :param timeout: Timeout for the request.
-        :param session: Optionally, an existing aiohttp.ClientSession.
+        :param session: Optionally, an existing aiohttp.ClientSession. Defaults to the shared session.
         :return: The full aiohttp.ClientResponse object or None if all attempts fail.
         """
 
         if not self.auto_fetch_proxies:
             raise Exception("THE AUTO FETCH PROXIES OPTION IS NOT ENABLED. PLEASE ENABLE IT TO USE THIS METHOD.")
 
-        if session is None:
-            session = aiohttp.ClientSession()
-
         while True:  # Infinite retry loop
             proxy = await self.get_proxy()
 
@@ -167,5 +182,10 @@ class Manager:
             except Exception:
                 self.feedback_proxy(success=False)
 
+    async def aclose(self) -> None:
+        """Writes pending proxy data and closes the shared HTTP session. Call it once you are done with the manager."""
+        await self.data_manager.aclose()
+        await close_session()
+
     def __len__(self):
         return len(self.data_manager)
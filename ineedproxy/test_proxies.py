@@ -6,6 +6,7 @@ from .utils import ProxyDict
 from .logger import logger
 
 import aiohttp
+import msgspec
 
 
 async def _is_proxy_valid(
@@ -52,9 +53,9 @@ async def _is_proxy_valid(
         ) as response:
             if response.status == 200:
                 try:
-                    json_data = await response.json()
+                    json_data = msgspec.json.decode(await response.read())
                     if 'origin' in json_data:
-                        logger.debug(f"Valid: {url}")
+                        logger.debug("Valid: %s", url)
                         return proxy
                 except:
                     pass
@@ -1,6 +1,10 @@
 import re
 from collections import defaultdict
-from typing import Union, TypedDict, List, Dict, Set, Optional
+from typing import Union, TypedDict, List, Dict, Optional
+
+import msgspec
+
+_ALLOWED_PROTOCOLS = frozenset(("http", "https", "socks4", "socks5"))
 
 
 def _get_port(port: str) -> Union[int, None]:
@@ -14,7 +18,7 @@ def _get_port(port: str) -> Union[int, None]:
 
 
 def _get_protocol(protocol: str) -> Union[str, None]:
-    if protocol in ['http', 'https', 'socks4', 'socks5']:
+    if protocol in _ALLOWED_PROTOCOLS:
         return protocol
     return None
 
@@ -89,6 +93,20 @@ class ProxyDict(TypedDict):
     anonymity: str | None
 
 
+class ProxyTable(msgspec.Struct, array_like=True):
+    """
+    Stored proxies with one column per field, serialized as arrays to keep the store file small.
+    The counters are packed little-endian int32 arrays, see file_ops.counters_to_bytes.
+    """
+    url: List[str]
+    protocol: List[Optional[str]]
+    country: List[Optional[str]]
+    anonymity: List[Optional[str]]
+    times_failed: bytes
+    times_succeed: bytes
+    times_failed_in_row: bytes
+
+
 class ProxyPreferences(TypedDict, total=False):
     protocol: Optional[Union[str, List[str]]]
     country: Optional[Union[str, List[str]]]
@@ -99,33 +117,46 @@ class ProxyPreferences(TypedDict, total=False):
 
 
 class ProxyIndex:
-    """An indexing system for efficient proxy lookup and filtering operations."""
+    """
+    An indexing system for efficient proxy lookup and filtering operations.
+    Every value maps to a bitmap of proxy indices: bit i is set if proxy i has that value.
+    """
 
     def __init__(self):
-        self.protocol_index: Dict[str, Set[int]] = defaultdict(set)
-        self.country_index: Dict[str, Set[int]] = defaultdict(set)
-        self.anonymity_index: Dict[str, Set[int]] = defaultdict(set)
-
-    def add_proxy(self, index: int, proxy: dict) -> None:
-        self.protocol_index[proxy["protocol"]].add(index)
-        self.country_index[proxy["country"]].add(index)
-        self.anonymity_index[proxy["anonymity"]].add(index)
-
-    def remove_proxy(self, index: int, proxy: dict) -> None:
-        self.protocol_index[proxy["protocol"]].discard(index)
-        self.country_index[proxy["country"]].discard(index)
-        self.anonymity_index[proxy["anonymity"]].discard(index)
+        self.protocol_index: Dict[str, int] = defaultdict(int)
+        self.country_index: Dict[str, int] = defaultdict(int)
+        self.anonymity_index: Dict[str, int] = defaultdict(int)
+
+    def add_proxy(self, index: int, protocol: Optional[str], country: Optional[str],
+                  anonymity: Optional[str]) -> None:
+        bit = 1 << index
+        self.protocol_index[protocol] |= bit
+        self.country_index[country] |= bit
+        self.anonymity_index[anonymity] |= bit
+
+    def remove_proxy(self, index: int, protocol: Optional[str], country: Optional[str],
+                     anonymity: Optional[str]) -> None:
+        bit = ~(1 << index)
+        self.protocol_index[protocol] &= bit
+        self.country_index[country] &= bit
+        self.anonymity_index[anonymity] &= bit
+
+    def move_proxy(self, old_index: int, new_index: int, protocol: Optional[str], country: Optional[str],
+                   anonymity: Optional[str]) -> None:
+        self.remove_proxy(old_index, protocol, country, anonymity)
+        self.add_proxy(new_index, protocol, country, anonymity)
 
     def clear(self) -> None:
         self.protocol_index.clear()
         self.country_index.clear()
         self.anonymity_index.clear()
 
-    def rebuild_index(self, proxies: List[dict]) -> None:
-        """Rebuild the entire index from a list of proxies."""
+    def rebuild_index(self, protocols: List[Optional[str]], countries: List[Optional[str]],
+                      anonymities: List[Optional[str]]) -> None:
+        """Rebuild the entire index from the proxy columns."""
         self.clear()
-        for i, proxy in enumerate(proxies):
-            self.add_proxy(i, proxy)
+        for i, (protocol, country, anonymity) in enumerate(zip(protocols, countries, anonymities)):
+            self.add_proxy(i, protocol, country, anonymity)
 
     def __str__(self):
         return f"protocol_index: {self.protocol_index}, country_index: {self.country_index}, anonymity_index: {self.anonymity_index}"
@@ -202,5 +233,5 @@ class NoValidProxyAvailable(Exception):
         return f"NoValidProxyAvailable: {self.message}"
 
 
-__all__ = ['URL', 'ProxyDict', 'ProxyPreferences', 'ProxyIndex', 'convert_to_proxy_dict_format', 'NoProxyAvailable',
+__all__ = ['URL', 'ProxyDict', 'ProxyTable', 'ProxyPreferences', 'ProxyIndex', 'convert_to_proxy_dict_format', 'NoProxyAvailable',
            'NoValidProxyAvailable']
@@ -1,5 +1,9 @@
 from setuptools import setup, find_packages
-from ineedproxy.version import __version__
+
+# Read the version without importing the package, which needs the dependencies installed
+version = {}
+with open("ineedproxy/version.py") as fh:
+    exec(fh.read(), version)
 
 with open("README.md", "r") as fh:
     long_description = fh.read()
@@ -9,12 +13,14 @@ with open("requirements.txt") as f:
 
 setup(
     name="ineedproxy",
-    version=__version__,
+    version=version["__version__"],
     description="An aio library designed for easy and reliable access to working proxies. It primarily fetches, manages, rotates, and stores proxy data.",
     long_description=long_description,
     long_description_content_type="text/markdown",
     author="Paul Hartwich",
-    packages=find_packages(),
+    packages=find_packages(include=["ineedproxy", "ineedproxy.*"]),
+    include_package_data=True,
+    package_data={"ineedproxy": ["py.typed"]},
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",